@@ -25,10 +25,13 @@ except ImportError:
     pass
 
 # load the file index created by download.sync_data, if one exists
+import numpy as _np
 try:
-    import numpy as _np
     from .user_paths import l1b_dir
-    _index_filename = _os.path.join(l1b_dir, 'filenames.npy')
-    _iuvs_filenames_index = _np.load(_index_filename)
+    _index_filename = _os.path.join(l1b_dir, 'filenames.npz')
+    with _np.load(_index_filename) as _index:
+        # the index stores paths relative to l1b_dir
+        _iuvs_filenames_index = _np.char.add(_os.path.join(l1b_dir, ''),
+                                             _index['names'])
 except (ImportError, FileNotFoundError):
     _iuvs_filenames_index = _np.array([])
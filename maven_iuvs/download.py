@@ -1,31 +1,57 @@
 import os
+import re
 import glob
+import fnmatch
+import shlex
+import shutil
 import subprocess
 import time
 import tempfile
 import datetime
+import hashlib
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from getpass import getpass
+from collections import deque, namedtuple
+from html.parser import HTMLParser
+from urllib.parse import urljoin
 
-# twill's __init__.py is dumb, we need to work around it to play nice
-# with jupyter:
-import sys
-_stdout = sys.stdout
-_stderr = sys.stdout
-
-import twill
-twill.set_output(_stdout)
-twill.set_errout(_stderr)
-twill.set_loglevel(twill.loglevels['WARNING'])
-
-
-import pexpect
 import paramiko
+import requests
 
 import numpy as np
 
 from maven_iuvs.miscellaneous import clear_line
 from maven_iuvs.search import get_filename_glob_string, get_latest_files
 
+# location of the user_paths.py file generated by setup_user_paths
+_pyuvs_path = os.path.dirname(os.path.realpath(__file__))
+_user_paths_py = os.path.join(_pyuvs_path, "user_paths.py")
+
+# set once user_paths.py is known to exist
+_user_paths_ready = False
+
+# serializes progress messages printed from worker threads
+_print_lock = threading.Lock()
+
+# rsync processes started by call_rsync that are still running, so
+# they can be stopped from the main thread by stop_rsync
+_rsync_processes = []
+_rsync_lock = threading.Lock()
+_rsync_stopping = threading.Event()
+
+# directory holding the temporary ssh password helpers made by
+# call_rsync, which must allow executables
+_askpass_parent_dir = os.path.join(
+    os.environ.get("XDG_CACHE_HOME",
+                   os.path.join(os.path.expanduser("~"), ".cache")),
+    "maven_iuvs")
+
+# matches rsync progress lines, e.g.
+#   "1,234,567  45%  1.23MB/s  0:00:12 (xfr#5, to-chk=100/200)"
+_rsync_progress_re = re.compile(r'([0-9]+)%.*=([0-9]+/[0-9]+)')
+
 
 def get_user_paths_filename():
     """
@@ -45,12 +71,9 @@ def get_user_paths_filename():
        Absolute file path to user_paths.py
     """
 
-    pyuvs_path = os.path.dirname(os.path.realpath(__file__))
-    user_paths_py = os.path.join(pyuvs_path, "user_paths.py")
+    file_exists = os.path.exists(_user_paths_py)
 
-    file_exists = os.path.exists(user_paths_py)
-
-    return file_exists, user_paths_py
+    return file_exists, _user_paths_py
 
 
 def setup_user_paths():
@@ -74,10 +97,15 @@ def setup_user_paths():
 
     """
 
+    global _user_paths_ready
+    if _user_paths_ready:
+        return
+
     # if user_paths.py already exists then assume that the user has
     # set everything up already
     file_exists, user_paths_py = get_user_paths_filename()
     if file_exists:
+        _user_paths_ready = True
         return
 
     # get the location of the default L1B and SPICE directory
@@ -116,6 +144,7 @@ def setup_user_paths():
     user_paths_file.write("iuvs_vm_username = \""+vm_username+"\"\n")
     user_paths_file.write("auto_spice_load = "+auto_spice_load+"\n")
     user_paths_file.close()
+    _user_paths_ready = True
     # now scripts can import the relevant directories from user_paths
 
 
@@ -144,10 +173,40 @@ def get_default_l1b_directory():
     return l1b_dir
 
 
+def get_ssh_version():
+    """
+    Returns the version of the OpenSSH client used by rsync.
+
+    Parameters
+    ----------
+    none
+
+    Returns
+    -------
+    version : tuple or None
+        (major, minor) version numbers, or None if ssh isn't OpenSSH
+        or can't be run.
+    """
+    try:
+        result = subprocess.run(['ssh', '-V'],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT,
+                                text=True)
+    except OSError:
+        return None
+
+    match = re.search(r'OpenSSH_([0-9]+)\.([0-9]+)', result.stdout)
+    if match is None:
+        return None
+
+    return int(match.group(1)), int(match.group(2))
+
+
 def call_rsync(remote_path,
                local_path,
                ssh_password,
-               extra_flags=""):
+               extra_flags="",
+               status_tag=""):
     """
     Updates data (e.g., L1b data and SPICE kernels) by rsyncing the VM
     folders to the local machine.
@@ -161,7 +220,8 @@ def call_rsync(remote_path,
         Path to the sync on the local machine.
 
     ssh_password : str
-        Plain text to send to process when it prompts for a password
+        Plain text password, handed to ssh through SSH_ASKPASS when the
+        server prompts for it
 
     extra_flags : str
         Extra flags for rsync command.
@@ -169,6 +229,10 @@ def call_rsync(remote_path,
         -trzL and -info=progress2 are already specified, extra_flags
          text are inserted afterward. Defaults to "".
 
+    status_tag : str
+        Tag to decorate the progress print string, so that concurrent
+        transfers can be told apart. Defaults to "".
+
     Returns
     -------
     none
@@ -197,43 +261,234 @@ def call_rsync(remote_path,
                               remote_path,
                               local_path])
 
+    # ssh reads the password from an askpass helper that echoes it
+    # from the environment, so it never touches the disk. ssh has to
+    # execute the helper, so it goes in a private directory in the
+    # user's cache rather than /tmp, which is often mounted noexec
+    os.makedirs(_askpass_parent_dir, exist_ok=True)
+    askpass_dir = tempfile.mkdtemp(dir=_askpass_parent_dir)
+    askpass = os.path.join(askpass_dir, "askpass.sh")
+
     # print("running rsync_command: " + rsync_command)
-    child = pexpect.spawn(rsync_command,
-                          encoding='utf-8')
+    rsync_messages = deque(maxlen=10)
+    try:
+        with open(askpass, "w") as file:
+            file.write('#!/bin/sh\n'
+                       'printf "%s\\n" "$MAVEN_IUVS_SSH_PASSWORD"\n')
+        os.chmod(askpass, 0o700)
+
+        env = dict(os.environ,
+                   MAVEN_IUVS_SSH_PASSWORD=ssh_password,
+                   SSH_ASKPASS=askpass,
+                   SSH_ASKPASS_REQUIRE="force")
+
+        # ssh older than 8.4 ignores SSH_ASKPASS_REQUIRE and only uses
+        # the helper if DISPLAY is set
+        ssh_version = get_ssh_version()
+        if (ssh_version is not None and ssh_version < (8, 4)
+                and "DISPLAY" not in env):
+            env["DISPLAY"] = ":0"
+
+        # make sure the helper can run before ssh relies on it
+        try:
+            check = subprocess.run([askpass],
+                                   env=env,
+                                   stdout=subprocess.PIPE,
+                                   text=True)
+            askpass_works = check.stdout == ssh_password + "\n"
+        except OSError:
+            askpass_works = False
+        if not askpass_works:
+            raise Exception("Cannot run the ssh password helper in "
+                            + askpass_dir + " --- is it on a noexec"
+                            " filesystem? Set XDG_CACHE_HOME to a"
+                            " directory that allows executables.")
+
+        # start_new_session detaches rsync from the terminal, so
+        # older versions of ssh also fall back to SSH_ASKPASS. This
+        # also keeps Ctrl-C from reaching rsync, so it is registered
+        # to be stopped by stop_rsync instead
+        with _rsync_lock:
+            if _rsync_stopping.is_set():
+                raise Exception("rsync was cancelled")
+            rsync = subprocess.Popen(shlex.split(rsync_command),
+                                     stdin=subprocess.DEVNULL,
+                                     stdout=subprocess.PIPE,
+                                     stderr=subprocess.STDOUT,
+                                     env=env,
+                                     start_new_session=True,
+                                     text=True,
+                                     errors="replace",
+                                     bufsize=1)
+            _rsync_processes.append(rsync)
+
+        with rsync:
+            try:
+                # interpret rsync output one line at a time, rsync ends
+                # progress lines with \r which text mode treats as a newline
+                for line in rsync.stdout:
+                    match = _rsync_progress_re.search(line)
+                    if match is None:
+                        # keep the latest messages in case rsync fails
+                        if line.strip():
+                            rsync_messages.append(line.rstrip())
+                        continue
+
+                    # print some progress info
+                    percent = match.group(1) + "%"
+
+                    # get files left to check also
+                    file_numbers = match.group(2)
+
+                    if version < 313:
+                        # compute progress from file numbers
+                        fnum1, fnum2 = list(map(int, file_numbers.split("/")))
+                        percent = 1.0 - fnum1 / fnum2
+                        percent = str(int(percent*100)) + "%"
+
+                    with _print_lock:
+                        clear_line()
+                        print(status_tag + "rsync progress: " +
+                              percent +
+                              ' (files left: ' + file_numbers + ')',
+                              end='\r')
+            except BaseException:
+                # e.g. Ctrl-C while rsyncing in the main thread
+                rsync.terminate()
+                raise
+            finally:
+                with _rsync_lock:
+                    _rsync_processes.remove(rsync)
+    finally:
+        shutil.rmtree(askpass_dir)
+
+    with _print_lock:
+        clear_line()  # clear last rsync message
+
+    if rsync.returncode != 0:
+        raise Exception("rsync exited with status "
+                        + str(rsync.returncode) + ":\n"
+                        + "\n".join(rsync_messages))
+
+
+def stop_rsync():
+    """
+    Terminates all running rsync processes started by call_rsync, and
+    keeps call_rsync from starting new ones until sync_data next runs.
 
-    # interpret rsync output by searching for patterns
-    cpl = child.compile_pattern_list([pexpect.EOF,
-                                      '.* password: ',
-                                      '[0-9]+%'])
-    while True:
-        i = child.expect_list(cpl, timeout=None)
-        if i == 0:  # end of file
-            break
-        if i == 1:  # password request
-            # respond to server password request
-            child.sendline(ssh_password)
-        if i == 2:  # rsyncing and printing progress
-            # print some progress info
-            percent = child.after.strip(" \t\n\t")
-
-            # get files left to check also
-            child.expect('[0-9]+/[0-9]+', timeout=None)
-            file_numbers = child.after.strip(" \t\n\t")
-
-            if version < 313:
-                # compute progress from file numbers
-                fnum1, fnum2 = list(map(int, file_numbers.split("/")))
-                percent = 1.0 - fnum1 / fnum2
-                percent = str(int(percent*100)) + "%"
+    Parameters
+    ----------
+    none
 
-            clear_line()
-            print("rsync progress: " +
-                  percent +
-                  ' (files left: ' + file_numbers + ')',
-                  end='\r')
+    Returns
+    -------
+    none
+
+    """
+    with _rsync_lock:
+        _rsync_stopping.set()
+        for rsync in _rsync_processes:
+            rsync.terminate()
+
+
+def rsync_file_list(remote_path,
+                    local_path,
+                    files,
+                    ssh_password,
+                    status_tag=""):
+    """
+    Rsyncs a list of files from the VM to the local machine.
+
+    Parameters
+    ----------
+    remote_path : str
+        Path on the remote machine that the file names are relative to.
+
+    local_path : str
+        Path to the sync on the local machine.
+
+    files : list
+        File names to sync, relative to remote_path.
+
+    ssh_password : str
+        Plain text password for the VM.
+
+    status_tag : str
+        Tag to decorate the progress print string. Defaults to "".
+
+    Returns
+    -------
+    none
+
+    """
+    # save the files to rsync to a temporary file
+    # this way rsync can use the files_from flag
+    with tempfile.NamedTemporaryFile("w", delete=False) as transfer_file:
+        transfer_file.write("".join(f + "\n" for f in files))
+
+    try:
+        call_rsync(remote_path,
+                   local_path,
+                   ssh_password,
+                   extra_flags='--files-from=' + transfer_file.name,
+                   status_tag=status_tag)
+    finally:
+        os.remove(transfer_file.name)
+
+
+def list_vm_folders(ssh, folders, batch_size=200):
+    """
+    List the contents of many folders on the VM using one remote shell
+    command per batch of folders. Used when the server doesn't offer
+    SFTP, to avoid a round trip per folder.
+
+    Parameters
+    ----------
+    ssh : paramiko.SSHClient
+        Client connected to the VM.
+
+    folders : list
+        Absolute paths of the folders to list on the VM.
+
+    batch_size : int
+        Maximum number of folders listed by each remote command, to stay
+        under the server's command line length limit. Defaults to 200.
+
+    Returns
+    -------
+    folder_contents : dict
+        Names of the entries in each folder, keyed by the folder path as
+        given. Folders that can't be listed have no entries.
+
+    """
+    folder_contents = {}
+    for i in range(0, len(folders), batch_size):
+        # print each folder's absolute path before its contents
+        batch = " ".join(shlex.quote(f) for f in folders[i:i+batch_size])
+        cmd = ('for d in ' + batch + '; do echo "$d";'
+               ' ls -1 "$d" 2>/dev/null; done')
+        stdin, stdout, stderr = ssh.exec_command(cmd)
+
+        folder_contents.update(
+            _parse_folder_listing(stdout.read().decode()))
+
+    return folder_contents
+
+
+def _parse_folder_listing(output):
+    # Split the output of list_vm_folders' remote command into a dict
+    # of folder -> entry names. Folder paths are absolute, so they start
+    # with "/", which can never begin a file name printed by ls -1.
+    folder_contents = {}
+    folder = None
+    for line in output.splitlines():
+        if line.startswith("/"):
+            folder = line
+            folder_contents[folder] = []
+        elif line and folder is not None:
+            folder_contents[folder].append(line)
 
-    child.close()
-    clear_line()  # clear last rsync message
+    return folder_contents
 
 
 def get_vm_file_list(server,
@@ -243,7 +498,8 @@ def get_vm_file_list(server,
                      pattern="*.fits*",
                      minorb=100, maxorb=100000,
                      include_cruise=False,
-                     status_tag=""):
+                     status_tag="",
+                     max_workers=8):
     """
     Get a list of files from the VM that match a given pattern.
 
@@ -278,54 +534,163 @@ def get_vm_file_list(server,
         Tag to decorate orbit number print string and inform user of progress.
         Defaults to "".
 
+    max_workers : int
+        Number of folders to list concurrently, each over its own SFTP
+        channel. Keep this below the server's sshd MaxSessions limit
+        (10 by default). Defaults to 8.
+
     Returns
     -------
-    files : np.array
+    files : list
         list of server filenames that match the pattern
     """
 
     # connect to the server using paramiko
     ssh = paramiko.SSHClient()
     ssh.load_system_host_keys()
-    ssh.connect(server, username=username, password=password)
 
-    # get the list of folders on the VM
-    stdin, stdout, stderr = ssh.exec_command('ls '+serverdir)
-    server_orbit_folders = np.loadtxt(stdout, dtype=str)
+    # every SFTP client opened below, closed along with the connection
+    sftp_clients = []
 
-    # determine what folders to look for files in
-    sync_orbit_folders = ["orbit"+str(orbno).zfill(5)
-                          for orbno in np.arange(minorb, maxorb, 100)]
-    if include_cruise:
-        sync_orbit_folders = np.append(["cruise"], sync_orbit_folders)
+    try:
+        ssh.connect(server, username=username, password=password,
+                    compress=True)
+
+        # raise the window size used by the SFTP channels opened below,
+        # and postpone rekeying, so that large listings are limited by
+        # the network rather than by waiting on window adjustments
+        transport = ssh.get_transport()
+        transport.default_window_size = 134217727
+        transport.packetizer.REKEY_BYTES = pow(2, 40)
+        transport.packetizer.REKEY_PACKETS = pow(2, 40)
+
+        # get the list of folders on the VM, falling back to the remote
+        # shell if the server doesn't offer SFTP
+        try:
+            sftp = ssh.open_sftp()
+        except paramiko.SSHException:
+            sftp = None
 
-    # sync only folders that belong to both groups
-    sync_orbit_folders = server_orbit_folders[np.isin(server_orbit_folders,
-                                                      sync_orbit_folders,
-                                                      assume_unique=True)]
+        if sftp is None:
+            server_orbit_folders = list_vm_folders(ssh, [serverdir])[serverdir]
+            server_orbit_folders = sorted(server_orbit_folders)
+        else:
+            sftp_clients.append(sftp)
+            server_orbit_folders = sorted(sftp.listdir(serverdir))
+
+        # determine what folders to look for files in
+        sync_orbit_folders = {"orbit"+str(orbno).zfill(5)
+                              for orbno in range(minorb, maxorb, 100)}
+        if include_cruise:
+            sync_orbit_folders.add("cruise")
+
+        # sync only folders that belong to both groups
+        sync_orbit_folders = [folder for folder in server_orbit_folders
+                              if folder in sync_orbit_folders]
+
+        # translate the glob pattern once rather than for every filename
+        pattern_match = re.compile(fnmatch.translate(pattern)).match
+
+        if sftp is None:
+            # list all of the folders with a few batched ls commands
+            with _print_lock:
+                clear_line()
+                print(status_tag+"listing "+str(len(sync_orbit_folders))
+                      + " folders", end="\r")
+
+            folder_paths = [serverdir+folder+"/"
+                            for folder in sync_orbit_folders]
+            folder_contents = list_vm_folders(ssh, folder_paths)
+
+            return [folder_path+name
+                    for folder_path in folder_paths
+                    for name in sorted(folder_contents.get(folder_path, []))
+                    if pattern_match(name)]
+
+        # SFTPClient objects aren't thread-safe, so each worker thread
+        # opens its own SFTP channel on the shared SSH transport
+        thread_data = threading.local()
+        sftp_clients_lock = threading.Lock()
+
+        def list_folder(folder):
+            # get the filenames in a single folder that match the input
+            # pattern
+            if not hasattr(thread_data, 'sftp'):
+                thread_data.sftp = ssh.open_sftp()
+                with sftp_clients_lock:
+                    sftp_clients.append(thread_data.sftp)
+
+            with _print_lock:
+                clear_line()
+                print(status_tag+folder, end="\r")
+
+            # listdir_iter keeps several READDIR requests in flight
+            # instead of waiting on each reply in turn
+            folder_path = serverdir+folder+"/"
+            try:
+                attrs = thread_data.sftp.listdir_iter(folder_path)
+                # like the shell glob, skip hidden files (e.g. rsync
+                # temporary files)
+                return sorted([folder_path+a.filename
+                               for a in attrs
+                               if (not a.filename.startswith('.')
+                                   and pattern_match(a.filename))])
+            except IOError:
+                # skip folders that can't be listed, like the ls fallback
+                return []
+
+        # list the folders concurrently, keeping the output in folder order
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            files = list(executor.map(list_folder, sync_orbit_folders))
+
+        return list(itertools.chain.from_iterable(files))
+    finally:
+        for sftp in sftp_clients:
+            sftp.close()
+        ssh.close()
+
+
+def get_local_l1b_files(l1b_dir, pattern="*.fits*"):
+    """
+    List the files in the orbit folders of a local L1B directory that
+    match a given pattern.
 
-    # set up the output files array
-    files = []
+    Parameters
+    ----------
+    l1b_dir : str
+        Absolute path to the local directory containing orbit block
+        folders ("orbit01300", "orbit01400", etc.)
+
+    pattern : str
+        glob pattern used to search for matching files
+        Defaults to '*.fits*' (matches all FITS files)
 
-    # iterate through the folder list and get the filenames that match
-    # the input pattern
-    for folder in sync_orbit_folders:
-        clear_line()
-        print(status_tag+folder, end="\r")
+    Returns
+    -------
+    files : list
+        Sorted list of absolute paths of the matching files.
 
-        cmd = "ls "+serverdir+folder+"/"+pattern
-        stdin, stdout, stderr = ssh.exec_command(cmd)
+    Notes
+    -----
+    Equivalent to glob.glob(l1b_dir+"/*/"+pattern), but uses os.scandir
+    so each directory is read once without stat-ing every entry.
 
-        if len(stderr.read()) == 0:
-            files.append(np.loadtxt(stdout, dtype=str))
-        else:
-            continue
-    ssh.close()
+    """
+    # translate the glob pattern once rather than for every filename
+    pattern_match = re.compile(fnmatch.translate(pattern)).match
 
-    if len(files) == 0:
-        return []
-    else:
-        return np.concatenate(np.array(files, dtype=object))
+    files = []
+    with os.scandir(l1b_dir) as folders:
+        for folder in folders:
+            # like glob, skip hidden entries
+            if folder.name.startswith('.') or not folder.is_dir():
+                continue
+            with os.scandir(folder.path) as entries:
+                files.extend(entry.path for entry in entries
+                             if (not entry.name.startswith('.')
+                                 and pattern_match(entry.name)))
+
+    return sorted(files)
 
 
 def sync_data(spice=True, l1b=True,
@@ -390,6 +755,9 @@ def sync_data(spice=True, l1b=True,
     stage_l1b = '/maven_iuvs/stage/products/level1b/'
     vm_spice = login + '/maven_iuvs/stage/anc/spice/'
 
+    # allow rsync to run again if a previous sync was interrupted
+    _rsync_stopping.clear()
+
     # try to sync the files, if it fails, user probably isn't on the VPN
     try:
         # get user password for the VM
@@ -424,7 +792,7 @@ def sync_data(spice=True, l1b=True,
                                                maxorb=maxorb,
                                                include_cruise=include_cruise,
                                                status_tag='stage: ')
-            local_filenames = glob.glob(l1b_dir+"/*/"+pattern)
+            local_filenames = get_local_l1b_files(l1b_dir, pattern)
 
             if (len(prod_filenames) == 0 and len(stage_filenames) == 0):
                 print("No matching files on VM")
@@ -433,61 +801,61 @@ def sync_data(spice=True, l1b=True,
             # get the list of most recent files, no matter where they are
             #    order matters! putting local_filenames last ensures
             #    duplicates aren't checked or transferred
-            files_to_sync = get_latest_files(np.concatenate([prod_filenames,
+            files_to_sync = get_latest_files(itertools.chain(prod_filenames,
                                                              stage_filenames,
-                                                             local_filenames]))
+                                                             local_filenames))
 
             # figure out which files to get from production and stage
-            files_from_production = [a[len(production_l1b):]
-                                     for a in files_to_sync
-                                     if (a[:len(production_l1b)]
-                                         ==
-                                         production_l1b)]
-            files_from_stage = [a[len(stage_l1b):]
-                                for a in files_to_sync
-                                if a[:len(stage_l1b)] == stage_l1b]
-
-            # production
-            # save the files to rsync to temporary files
-            # this way rsync can use the files_from flag
-            transfer_from_production_file = tempfile.NamedTemporaryFile()
-            np.savetxt(transfer_from_production_file.name,
-                       files_from_production,
-                       fmt="%s")
-
+            files_from_production = []
+            files_from_stage = []
+            for a in files_to_sync:
+                if a.startswith(production_l1b):
+                    files_from_production.append(a[len(production_l1b):])
+                elif a.startswith(stage_l1b):
+                    files_from_stage.append(a[len(stage_l1b):])
+
+            # production and stage files don't overlap, so both
+            # transfers can run at the same time
             print('Syncing ' + str(len(files_from_production)) +
-                  ' files from production...')
-            call_rsync(login+production_l1b,
-                       l1b_dir,
-                       iuvs_vm_password,
-                       extra_flags=('--files-from=' +
-                                    transfer_from_production_file.name))
-
-            # stage, identical to above
-            transfer_from_stage_file = tempfile.NamedTemporaryFile()
-            np.savetxt(transfer_from_stage_file.name,
-                       files_from_stage,
-                       fmt="%s")
-
-            print('Syncing ' + str(len(files_from_stage)) +
+                  ' files from production and ' +
+                  str(len(files_from_stage)) +
                   ' files from stage...')
-            call_rsync(login+stage_l1b,
-                       l1b_dir,
-                       iuvs_vm_password,
-                       extra_flags=('--files-from=' +
-                                    transfer_from_stage_file.name))
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                transfers = [executor.submit(rsync_file_list,
+                                             login+production_l1b,
+                                             l1b_dir,
+                                             files_from_production,
+                                             iuvs_vm_password,
+                                             status_tag='production '),
+                             executor.submit(rsync_file_list,
+                                             login+stage_l1b,
+                                             l1b_dir,
+                                             files_from_stage,
+                                             iuvs_vm_password,
+                                             status_tag='stage ')]
+                # re-raise here any error from call_rsync, including
+                # a nonzero rsync exit status, before cleaning up
+                try:
+                    for transfer in transfers:
+                        transfer.result()
+                except BaseException:
+                    # Ctrl-C only reaches this thread, so stop both
+                    # transfers before the executor waits on them
+                    stop_rsync()
+                    raise
 
             # now delete all of the old files superseded by newer versions
             clear_line()
             print('Cleaning up old files...')
 
             # figure out what files need to be deleted
-            local_filenames = glob.glob(l1b_dir+"/*/*.fits*")
+            local_filenames = get_local_l1b_files(l1b_dir)
             latest_local_files = get_latest_files(local_filenames)
-            local_files_to_delete = list(set(local_filenames)
-                                         - set(latest_local_files))
+            local_files_to_delete = sorted(set(local_filenames)
+                                           - set(latest_local_files))
 
             # ask if it's OK to delete the old files
+            deleted_files = set()
             while True and len(local_files_to_delete) > 0:
                 del_files = input('Delete ' +
                                   str(len(local_files_to_delete)) +
@@ -496,8 +864,10 @@ def sync_data(spice=True, l1b=True,
                     # don't delete the files
                     break
                 if del_files == 'y':
-                    # delete the files
-                    [os.remove(f) for f in local_files_to_delete]
+                    # delete the files, overlapping the unlink calls
+                    with ThreadPoolExecutor(max_workers=16) as executor:
+                        list(executor.map(os.remove, local_files_to_delete))
+                    deleted_files = set(local_files_to_delete)
                     break
                 if del_files == 'p':
                     for f in local_files_to_delete:
@@ -509,14 +879,19 @@ def sync_data(spice=True, l1b=True,
             # Kyle's code keeps a list of these deleted files
             # in excluded_files.txt --- is this necessary?
 
-            # index all local files to speed up later finding
-            local_filenames = sorted(glob.glob(l1b_dir+"/*/*.fits*"))
-            np.save(l1b_dir+'/filenames', sorted(local_filenames))
+            # index all local files to speed up later finding, storing
+            # paths relative to l1b_dir to keep the index small
+            local_filenames = [f for f in local_filenames
+                               if f not in deleted_files]
+            l1b_prefix = os.path.join(l1b_dir, "")
+            np.savez_compressed(os.path.join(l1b_dir, 'filenames.npz'),
+                                names=np.array([f[len(l1b_prefix):]
+                                                for f in local_filenames],
+                                               dtype=str))
 
             # overwrite the package's loaded version of the above
-            from maven_iuvs import _iuvs_filenames_index
-            global _iuvs_filenames_index  # see __init__.py
-            _iuvs_filenames_index = np.array(local_filenames)
+            import maven_iuvs  # see __init__.py
+            maven_iuvs._iuvs_filenames_index = np.array(local_filenames)
 
     except OSError:
         raise Exception('rsync failed --- are you connected to the VPN?')
@@ -531,6 +906,107 @@ def sync_data(spice=True, l1b=True,
     print('Data syncing and cleanup took %.2d:%.2d:%.2d.' % (h, m, s))
 
 
+# a hyperlink found on a web page
+_Link = namedtuple('_Link', ['text', 'url'])
+
+
+class _SDCPageParser(HTMLParser):
+    """
+    Collects the fields of the first form and all of the links on a
+    MAVEN SDC web page.
+    """
+    def __init__(self):
+        super().__init__()
+        self.form_action = None
+        self.form_method = "get"
+        self.form_fields = {}
+        self.links = []
+        self._in_form = False
+        self._href = None
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "form" and self.form_action is None:
+            self._in_form = True
+            self.form_action = attrs.get("action") or ""
+            self.form_method = (attrs.get("method") or "get").lower()
+        elif tag == "input" and self._in_form and attrs.get("name"):
+            # unchecked boxes aren't submitted with the form
+            if (attrs.get("type") in ("checkbox", "radio")
+                    and "checked" not in attrs):
+                return
+            self.form_fields[attrs["name"]] = attrs.get("value") or ""
+        elif tag == "a" and attrs.get("href"):
+            self._href = attrs["href"]
+            self._text = []
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self._in_form = False
+        elif tag == "a" and self._href is not None:
+            self.links.append(_Link("".join(self._text).strip(), self._href))
+            self._href = None
+
+    def handle_data(self, data):
+        if self._href is not None:
+            self._text.append(data)
+
+
+def _parse_sdc_page(response):
+    response.raise_for_status()
+    page = _SDCPageParser()
+    page.feed(response.text)
+    return page
+
+
+def sdc_login(url, sdc_username, sdc_password):
+    """
+    Log in to a page on the MAVEN SDC Team site.
+
+    Parameters
+    ----------
+    url : str
+        Address of a page protected by the SDC login form.
+    sdc_username : str
+        Web login username for MAVEN SDC Team site.
+    sdc_password : str
+        Web login password for MAVEN SDC Team site.
+
+    Returns
+    -------
+    session : requests.Session
+        Authenticated session, which can be used to download files.
+    links : list
+        Links on the page at url, as (text, url) named tuples. Link
+        urls are given as they appear on the page.
+
+    """
+    session = requests.Session()
+
+    # go to the SDC webpage and expect to see a login form
+    response = session.get(url)
+    page = _parse_sdc_page(response)
+    if page.form_action is None:
+        raise Exception("Cannot find the SDC login form at " + url)
+
+    # enter the login info
+    fields = dict(page.form_fields,
+                  username=sdc_username,
+                  password=sdc_password)
+    form_url = urljoin(response.url, page.form_action)
+    if page.form_method == "post":
+        response = session.post(form_url, data=fields)
+    else:
+        response = session.get(form_url, params=fields)
+    response.raise_for_status()
+
+    # load the page now that we're authenticated
+    page = _parse_sdc_page(session.get(url))
+
+    return session, page.links
+
+
 def get_euvm_l2b_dir():
     """
     Returns the directory where euvm_l2b data should be stored.
@@ -545,18 +1021,14 @@ def get_euvm_l2b_dir():
        Directory to store EUVM L2B files in.
     """
 
-    pyuvs_path = os.path.dirname(os.path.realpath(__file__))
-    user_paths_py = os.path.join(pyuvs_path, "user_paths.py")
-
-    if not os.path.exists(user_paths_py):
-        setup_user_paths()
+    setup_user_paths()
 
     try:
         from maven_iuvs.user_paths import euvm_l2b_dir
     except ImportError:
         # need to set euvm_l2b_dir
         euvm_l2b_dir = input("Where should euvm_l2b data be stored?")
-        with open(user_paths_py, "a+") as f:
+        with open(_user_paths_py, "a+") as f:
             f.write("# This line added by get_euvm_l2b_dir.py\n")
             f.write("euvm_l2b_dir = '"+euvm_l2b_dir+"'\n")
 
@@ -586,33 +1058,33 @@ def sync_euvm_l2b(sdc_username, sdc_password):
 
     euvm_l2b_dir = get_euvm_l2b_dir()
 
-    # go to the SDC webpage and expect to see a login form
-    twill.browser.reset()
-    twill.browser.go(url)
-
-    # enter the login info
-    twill.commands.fv("1", 'username', sdc_username)
-    twill.commands.fv("1", 'password', sdc_password)
-    twill.browser.submit()
-
-    # load the page now that we're authenticated
-    twill.browser.go(url)
+    # log in and get the links on the page
+    session, links = sdc_login(url, sdc_username, sdc_password)
 
     # find the most recent save file on the page
-    files = sorted([f.url for f in twill.browser.links if '.sav' in f.url])
+    files = sorted([f.url for f in links if '.sav' in f.url])
     most_recent = files[-1]
 
-    # navigate to that file
-    twill.browser.go(url+most_recent)
+    # stream the new file to disk without holding it in memory,
+    # writing to a partial file so an existing copy survives a failed
+    # download
+    fname = euvm_l2b_dir + most_recent
+    part_fname = fname + ".part"
+    try:
+        with session.get(urljoin(url, most_recent), stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            with open(part_fname, "wb") as file:
+                shutil.copyfileobj(response.raw, file, 65536)
+    except BaseException:
+        if os.path.exists(part_fname):
+            os.remove(part_fname)
+        raise
+    os.replace(part_fname, fname)
 
     # delete old EUVM files in the EUVM l2b directory
     old_fnames = glob.glob(euvm_l2b_dir+'*l2b*.sav')
-    [os.remove(f) for f in old_fnames]
-
-    # save the new file to disk
-    fname = euvm_l2b_dir + most_recent
-    with open(fname, "wb") as file:
-        file.write(twill.browser.dump)
+    [os.remove(f) for f in old_fnames if f != fname]
 
 
 def get_integrated_reports_dir():
@@ -631,11 +1103,7 @@ def get_integrated_reports_dir():
 
     """
 
-    pyuvs_path = os.path.dirname(os.path.realpath(__file__))
-    user_paths_py = os.path.join(pyuvs_path, "user_paths.py")
-
-    if not os.path.exists(user_paths_py):
-        setup_user_paths()
+    setup_user_paths()
 
     try:
         from maven_iuvs.user_paths import integrated_reports_dir
@@ -643,7 +1111,7 @@ def get_integrated_reports_dir():
         # need to set euvm_l2b_dir
         integrated_reports_dir = input("Where should MAVEN Integrated Reports"
                                        " data be stored?")
-        with open(user_paths_py, "a+") as f:
+        with open(_user_paths_py, "a+") as f:
             f.write("# This line added by get_integrated_reports_dir.py\n")
             f.write("integrated_reports_dir = '"+integrated_reports_dir+"'\n")
 
@@ -677,20 +1145,11 @@ def sync_integrated_reports(sdc_username, sdc_password, check_old=False):
 
     local_ir_dir = get_integrated_reports_dir()
 
-    # go to the SDC webpage and expect to see a login form
-    twill.browser.reset()
-    twill.browser.go(url)
-
-    # enter the login info
-    twill.commands.fv("1", 'username', sdc_username)
-    twill.commands.fv("1", 'password', sdc_password)
-    twill.browser.submit()
-
-    # load the page now that we're authenticated
-    twill.browser.go(url)
+    # log in and get the links on the page
+    session, links = sdc_login(url, sdc_username, sdc_password)
 
     # get the list of integrated report files on the server
-    server_links = sorted([f for f in twill.browser.links if '.txt' in f.text])
+    server_links = sorted([f for f in links if '.txt' in f.text])
 
     # get the list of local integrated report files
     local_files = [os.path.basename(f)
@@ -708,42 +1167,50 @@ def sync_integrated_reports(sdc_username, sdc_password, check_old=False):
                                                    or (f.text
                                                        not in local_files))]
 
-    # download the new files
-    from lxml.etree import ParserError
-    for link in to_download:
-        clear_line()
-        print(link.text, end="\r")
-
+    def local_file_digest(fname):
+        # return the SHA-256 digest of a local file, streamed in 64 kB
+        # blocks, or None if the file doesn't exist
+        if not os.path.exists(fname):
+            return None
+        file_hash = hashlib.sha256()
+        with open(fname, "rb") as file:
+            for block in iter(lambda: file.read(65536), b""):
+                file_hash.update(block)
+        return file_hash.digest()
+
+    def sync_report(link):
         # modify the page link to a download link
-        download_link = link.url.replace("inst_ops.php?content=file&file=",
-                                         "download-file.php?public/")
+        download_link = urljoin(url,
+                                link.url.replace("inst_ops.php"
+                                                 "?content=file&file=",
+                                                 "download-file.php?public/"))
 
         # get the binary of the file
-        try:
-            twill.browser.go(download_link)
-            server_binary_data = twill.browser.dump
-        except ParserError:
-            # sometimes the files have zero size,
-            # which results in a ParserError
-            server_binary_data = b""
-
-        # get the local filename
-        fname = os.path.join(local_ir_dir, link.text)
+        response = session.get(download_link)
+        response.raise_for_status()
+        server_binary_data = response.content
 
-        # look at the local file contents and compare with remote
-        if os.path.exists(fname):
-            with open(fname, "rb") as file:
-                if file.read() == twill.browser.dump:
-                    # file is the same as the server, keep it
-                    continue
+        # compare the local file contents with remote
+        fname = os.path.join(local_ir_dir, link.text)
+        server_digest = hashlib.sha256(server_binary_data).digest()
+        if local_file_digest(fname) == server_digest:
+            # file is the same as the server, keep it
+            return link
 
         # if we're here either the local file doesn't exist
         # or it's different from the server copy.
         # Either way, download the server version
-        fname = os.path.join(local_ir_dir, link.text)
         with open(fname, "wb") as file:
             file.write(server_binary_data)
 
+        return link
+
+    # download the new files
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for link in executor.map(sync_report, to_download):
+            clear_line()
+            print(link.text, end="\r")
+
     clear_line()
 
 
@@ -354,9 +354,8 @@ def get_latest_files(files):
     #
     # Keeping the initial index allows us to put the list back
     # in its initial order at the end of the process
-    basenames = map(lambda i, f: [basename_sortable(f), i, f],
-                    range(len(files)),
-                    files)
+    basenames = [[basename_sortable(f), i, f]
+                 for i, f in enumerate(files)]
 
     # Sort the list by the file basename with the replacement above
     # reverse is specified because of the interaction with np.unique
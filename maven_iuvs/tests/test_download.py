@@ -0,0 +1,139 @@
+# Built-in imports
+import os
+import glob
+import tempfile
+from unittest import TestCase
+
+# Local imports
+from maven_iuvs.download import (_parse_folder_listing,
+                                 _rsync_progress_re,
+                                 _SDCPageParser,
+                                 get_local_l1b_files)
+
+
+class TestParseFolderListing(TestCase):
+    def test_entries_are_grouped_by_folder(self):
+        output = ("/vm/orbit00100/\n"
+                  "a.fits.gz\n"
+                  "b.xml\n"
+                  "/vm/orbit00200/\n"
+                  "c.fits.gz\n")
+        self.assertEqual({'/vm/orbit00100/': ['a.fits.gz', 'b.xml'],
+                          '/vm/orbit00200/': ['c.fits.gz']},
+                         _parse_folder_listing(output))
+
+    def test_empty_folder_has_no_entries(self):
+        output = "/vm/orbit00100/\n/vm/orbit00200/\nc.fits.gz\n"
+        self.assertEqual([], _parse_folder_listing(output)['/vm/orbit00100/'])
+
+    def test_file_name_starting_with_hash_is_not_a_folder(self):
+        output = ("/vm/orbit00100/\n"
+                  "#weird\n"
+                  "a.fits.gz\n")
+        self.assertEqual({'/vm/orbit00100/': ['#weird', 'a.fits.gz']},
+                         _parse_folder_listing(output))
+
+    def test_empty_output_has_no_folders(self):
+        self.assertEqual({}, _parse_folder_listing(""))
+
+
+class TestRsyncProgressRegex(TestCase):
+    def test_progress2_line_gives_percent_and_files_left(self):
+        line = "      1,234,567  45%    1.23MB/s    0:00:12 (xfr#5, to-chk=100/200)"
+        match = _rsync_progress_re.search(line)
+        self.assertEqual(('45', '100/200'), match.groups())
+
+    def test_incremental_recursion_line_gives_files_left(self):
+        line = "    524,288  12%  256.00kB/s    0:00:02 (xfr#1, ir-chk=1020/1081)"
+        match = _rsync_progress_re.search(line)
+        self.assertEqual(('12', '1020/1081'), match.groups())
+
+    def test_old_progress_line_gives_percent_and_files_left(self):
+        line = "  32768 100%   31.25MB/s    0:00:00 (xfer#1, to-check=99/100)"
+        match = _rsync_progress_re.search(line)
+        self.assertEqual(('100', '99/100'), match.groups())
+
+    def test_file_name_line_does_not_match(self):
+        line = "orbit01300/mvn_iuv_l1b_apoapse-orbit01300-muv_20150609T172436_v13_r01.fits.gz"
+        self.assertIsNone(_rsync_progress_re.search(line))
+
+
+class TestSDCPageParser(TestCase):
+    def setUp(self):
+        self.page = _SDCPageParser()
+        self.page.feed(
+            '<html><body>'
+            '<form action="login.php" method="POST">'
+            '<input type="hidden" name="token" value="abc123">'
+            '<input type="text" name="username">'
+            '<input type="password" name="password">'
+            '<input type="checkbox" name="remember">'
+            '<input type="checkbox" name="agree" value="yes" checked>'
+            '<input type="submit" value="Log in">'
+            '</form>'
+            '<form action="search.php"><input name="q" value="x"></form>'
+            '<a href="mvn_euv_l2b_orbit_v14_r02.sav">orbit <b>save</b> file</a>'
+            '<a href="inst_ops.php?content=file&amp;file=ir.txt">'
+            'IR_2_201014_1.txt</a>'
+            '<a name="anchor">not a link</a>'
+            '</body></html>')
+
+    def test_first_form_action_is_found(self):
+        self.assertEqual('login.php', self.page.form_action)
+
+    def test_form_method_is_lowercase(self):
+        self.assertEqual('post', self.page.form_method)
+
+    def test_hidden_fields_are_kept_and_unchecked_boxes_dropped(self):
+        self.assertEqual({'token': 'abc123',
+                          'username': '',
+                          'password': '',
+                          'agree': 'yes'},
+                         self.page.form_fields)
+
+    def test_links_include_text_of_nested_markup(self):
+        self.assertEqual([('orbit save file',
+                           'mvn_euv_l2b_orbit_v14_r02.sav'),
+                          ('IR_2_201014_1.txt',
+                           'inst_ops.php?content=file&file=ir.txt')],
+                         self.page.links)
+
+    def test_page_without_form_has_no_action(self):
+        page = _SDCPageParser()
+        page.feed('<a href="a.sav">a</a>')
+        self.assertIsNone(page.form_action)
+        self.assertEqual('get', page.form_method)
+
+
+class TestGetLocalL1bFiles(TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.l1b_dir = self.tempdir.name
+        for path in ['orbit00100/b_v13_r01.fits.gz',
+                     'orbit00100/a_v13_s01.fits.gz',
+                     'orbit00100/a_v13_s01.xml',
+                     'orbit00100/.a_v13_r01.fits.gz.tmp',
+                     'orbit00200/c_v13_r01.fits.gz',
+                     '.hidden/d_v13_r01.fits.gz',
+                     'top_level_v13_r01.fits.gz']:
+            path = os.path.join(self.l1b_dir, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, 'w').close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_default_pattern_finds_fits_files_in_orbit_folders(self):
+        expected = [os.path.join(self.l1b_dir, f)
+                    for f in ['orbit00100/a_v13_s01.fits.gz',
+                              'orbit00100/b_v13_r01.fits.gz',
+                              'orbit00200/c_v13_r01.fits.gz']]
+        self.assertEqual(expected, get_local_l1b_files(self.l1b_dir))
+
+    def test_pattern_filters_file_names(self):
+        expected = [os.path.join(self.l1b_dir, 'orbit00100/a_v13_s01.xml')]
+        self.assertEqual(expected, get_local_l1b_files(self.l1b_dir, '*.xml'))
+
+    def test_matches_glob(self):
+        self.assertEqual(sorted(glob.glob(self.l1b_dir+"/*/*.fits*")),
+                         get_local_l1b_files(self.l1b_dir))
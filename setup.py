@@ -21,11 +21,10 @@ setuptools.setup(
         'numpy>=1.10',
         'paramiko>=2.6.0',
         'pdoc3>=0.9.1',
-        'pexpect>=4.8.0',
         'pytz>=2018.9',
+        'requests>=2.20',
         'spiceypy>=2.2.0',
         'sysrsync>=0.1.2',
-        'twill>=2.0.1',
         'mayavi>=4.7.2',
         'PyQt5>=5.15.2',
         'h5py>=2.10.0',